@@ -5,16 +5,58 @@ from pathlib import Path
 from fastapi import FastAPI, UploadFile, File, Form, Body, Query, Request # Import Request
 from fastapi.responses import FileResponse, JSONResponse, Response
 import os
+import re
+import stat
 import time
+import math
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 # import uvicorn # No longer needed if using command line uvicorn
-from indextts.infer import IndexTTS
+from indextts.infer import IndexTTS, NoSentencesError
 import tempfile
 import hashlib
+import io
+import wave
 from typing import Dict
 # import base64 # Not used in this version
 from pydantic import BaseModel
 
-app = FastAPI(title="IndexTTS API")
+try:
+    from blake3 import blake3 as cache_hasher
+except ImportError:
+    # blake2b is in the stdlib and still much faster than md5 for short keys
+    def cache_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; fall back to the stdlib json used by JSONResponse
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Runs the cache janitor, prompt watcher and synthesis batcher for the app's lifetime."""
+    tasks = [asyncio.create_task(coro) for coro in (cache_janitor(), prompt_watcher(), synthesis_batcher())]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Let pending cache writes finish so no half-written .part files are left
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+
+app = FastAPI(title="IndexTTS API", default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # Initialize the TTS model
 # Only initialize once when the app starts
@@ -24,23 +66,369 @@ tts = IndexTTS(model_dir="checkpoints", cfg_path="checkpoints/config.yaml")
 # Ensure the 'prompts' directory exists
 prompts_dir = "prompts" # Define the directory for stored prompts
 os.makedirs(prompts_dir, exist_ok=True)
+# Prompt names must be bare file names; checked before touching the filesystem
+safe_prompt_name_re = re.compile(r"[\w.-]{1,128}")
+max_text_length = 2000
+
+# Ensure the tmp directory exists for caching; created once here, never per request
+tmp_dir = Path(f'{os.path.dirname(__file__)}/tmp').as_posix() # Define tmp_dir relative to the script
+os.makedirs(tmp_dir, exist_ok=True)
+
+# Audio for a cache key is served unchanged while it is cached, so clients may reuse it
+audio_cache_control = "public, max-age=3600"
+
+def audio_file_response(path: str, etag: str) -> Response:
+    """
+    Returns a WAV file response; FileResponse handles HEAD and Range requests itself.
+    The file is only sent zero-copy when both Starlette (a release with pathsend
+    support) and the ASGI server (e.g. Granian) implement the
+    `http.response.pathsend` extension. Uvicorn, as launched below, does not
+    advertise it, so there FileResponse streams the file in chunks as usual.
+    """
+    # Content-Length is filled in from the file's stat result
+    return FileResponse(
+        path, media_type="audio/wav", headers={"ETag": etag, "Cache-Control": audio_cache_control}
+    )
+
+def audio_bytes_response(data: bytes, etag: str) -> Response:
+    """Returns in-memory WAV bytes with an explicit Content-Length."""
+    return Response(
+        content=data,
+        media_type="audio/wav",
+        headers={"Content-Length": str(len(data)), "ETag": etag, "Cache-Control": audio_cache_control},
+    )
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """
+    Checks an If-None-Match header value (a comma-separated list of tags) against
+    etag using weak comparison. "*" is not honoured: it would answer 304 for
+    texts that were never synthesized.
+    """
+    if not if_none_match:
+        return False
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque_tag:
+            return True
+    return False
+
+# Cache entries live for a base TTL that grows with how often they are requested:
+# ttl = min(max, base * (1 + log2(hits + 1))). One-shot prompts expire after the
+# base TTL, hot prompts are kept for up to cache_max_ttl_seconds.
+cache_base_ttl_seconds = 3600 # 1 hour
+cache_max_ttl_seconds = 24 * 3600 # 1 day
+# Per cache key: {"hits": int, "last": last access timestamp, "on_disk": bool}.
+# "hits" counts cache hits after the entry was created (synthesized, or adopted
+# from disk), so every entry starts at 0 with the base TTL.
+cache_meta: Dict[str, dict] = {}
+
+def effective_cache_ttl(hits: int) -> float:
+    return min(cache_max_ttl_seconds, cache_base_ttl_seconds * (1 + math.log2(hits + 1)))
+
+def record_cache_access(key: str):
+    meta = cache_meta.get(key)
+    if meta is not None:
+        meta["hits"] += 1
+        meta["last"] = time.time()
+
+# In-process LRU of recently synthesized audio, checked before the disk cache.
+# Maps cache key -> WAV bytes. Expiry is handled by the cache janitor. Bounded by
+# total size, since one entry can be several minutes of 24 kHz audio (tens of MB);
+# larger outputs are only served from the disk cache.
+memory_cache_max_bytes = 256 * 1024 * 1024
+memory_cache_max_entry_bytes = 8 * 1024 * 1024
+memory_cache: "OrderedDict[str, bytes]" = OrderedDict()
+memory_cache_bytes = 0
+memory_cache_lock = asyncio.Lock()
+
+async def memory_cache_get(key: str):
+    """Returns the cached WAV bytes for key, or None if missing."""
+    data = memory_cache.get(key)
+    if data is None:
+        return None
+    async with memory_cache_lock:
+        if key in memory_cache:
+            memory_cache.move_to_end(key)
+    return data
+
+def memory_cache_pop(key: str):
+    """Removes key from the memory cache; the caller holds memory_cache_lock."""
+    global memory_cache_bytes
+    data = memory_cache.pop(key, None)
+    if data is not None:
+        memory_cache_bytes -= len(data)
+
+async def memory_cache_put(key: str, data: bytes):
+    """Stores WAV bytes for key, evicting the least recently used entries until under the byte budget."""
+    global memory_cache_bytes
+    if len(data) > memory_cache_max_entry_bytes:
+        return
+    async with memory_cache_lock:
+        memory_cache_pop(key)
+        memory_cache[key] = data
+        memory_cache_bytes += len(data)
+        while memory_cache_bytes > memory_cache_max_bytes:
+            _, evicted = memory_cache.popitem(last=False)
+            memory_cache_bytes -= len(evicted)
+
+def write_file_bytes(path: str, data: bytes):
+    """Writes data to path atomically so readers never see a partial WAV."""
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+# Strong references to fire-and-forget tasks so they are not garbage collected
+background_tasks = set()
+
+async def persist_to_disk_cache(key: str, path: str, data: bytes):
+    try:
+        await asyncio.to_thread(write_file_bytes, path, data)
+    except Exception as e:
+        print(f"Error writing cache file {path}: {e}")
+        return
+    meta = cache_meta.get(key)
+    if meta is not None:
+        meta["on_disk"] = True
+
+def schedule_persist(key: str, path: str, data: bytes):
+    task = asyncio.create_task(persist_to_disk_cache(key, path, data))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def get_cache_file_mtime(path: str):
+    """Returns the modification time of a cache file, or None if it does not exist (one stat call)."""
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+def remove_cache_file(path: str):
+    try:
+        os.unlink(path)
+        print(f"Expired cache file removed: {path}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error removing expired cache file {path}: {e}")
+
+def remove_expired_cache_files(expired_keys):
+    """Deletes the files of expired keys, plus untracked files (e.g. from a previous run) older than the base TTL."""
+    for key in expired_keys:
+        # The key may have been synthesized again since it expired
+        if key not in cache_meta:
+            remove_cache_file(os.path.join(tmp_dir, generate_cache_filename(key)))
+    now = time.time()
+    with os.scandir(tmp_dir) as entries:
+        for entry in entries:
+            if not entry.name.startswith("synthesized-"):
+                continue
+            key = entry.name[len("synthesized-"):].split(".", 1)[0]
+            if key in cache_meta:
+                continue
+            try:
+                if now - entry.stat().st_mtime >= cache_base_ttl_seconds:
+                    remove_cache_file(entry.path)
+            except FileNotFoundError:
+                pass
+
+async def cache_janitor(interval_seconds: float = 60):
+    """Evicts entries whose access-based TTL has passed, off the request path."""
+    while True:
+        try:
+            now = time.time()
+            expired_keys = [
+                key for key, meta in cache_meta.items()
+                if now - meta["last"] > effective_cache_ttl(meta["hits"])
+            ]
+            if expired_keys:
+                async with memory_cache_lock:
+                    for key in expired_keys:
+                        cache_meta.pop(key, None)
+                        memory_cache_pop(key)
+            await asyncio.to_thread(remove_expired_cache_files, expired_keys)
+        except Exception as e:
+            print(f"Cache cleanup error: {e}")
+        await asyncio.sleep(interval_seconds)
+
+# Reference prompts are decoded into cond_mel tensors up front, so synthesis
+# skips reading and decoding the WAV. Maps prompt path -> mtime when loaded.
+preloaded_prompt_mtimes: Dict[str, float] = {}
+
+def get_prompt_mtime(path: str):
+    """Returns the modification time of a prompt file, or None if it is not a regular file."""
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+    return stat_result.st_mtime
+
+def refresh_preloaded_prompts():
+    """Preloads new or modified .wav files in prompts_dir and drops removed ones."""
+    current = {}
+    with os.scandir(prompts_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(".wav"):
+                current[os.path.join(prompts_dir, entry.name)] = entry.stat().st_mtime
+    for path in list(preloaded_prompt_mtimes):
+        if path not in current:
+            tts.preloaded_cond_mels.pop(path, None)
+            del preloaded_prompt_mtimes[path]
+    for path, mtime in current.items():
+        if preloaded_prompt_mtimes.get(path) == mtime:
+            continue
+        try:
+            tts.preload_audio_prompts([path])
+            preloaded_prompt_mtimes[path] = mtime
+            print(f"Preloaded prompt: {path}")
+        except Exception as e:
+            tts.preloaded_cond_mels.pop(path, None)
+            print(f"Error preloading prompt {path}: {e}")
+
+async def prompt_watcher(interval_seconds: float = 60):
+    """Picks up added, changed and removed prompt files periodically."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(refresh_preloaded_prompts)
+        except Exception as e:
+            print(f"Prompt refresh error: {e}")
+
+refresh_preloaded_prompts()
+
+def encode_wav(sampling_rate: int, wav_data) -> bytes:
+    """Encodes int16 samples shaped [N, channels] as WAV bytes in memory."""
+    # An empty result must fail the request rather than be served and cached
+    if wav_data.shape[0] == 0:
+        raise ValueError("synthesis produced no audio")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav_file:
+        wav_file.setnchannels(wav_data.shape[1])
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sampling_rate)
+        wav_file.writeframes(wav_data.tobytes())
+    return buf.getvalue()
+
+def infer_to_bytes(prompt_path: str, text: str) -> bytes:
+    """Runs synthesis and encodes the result as WAV bytes in memory, without touching the disk."""
+    # With output_path=None, infer_fast returns (sampling_rate, int16 samples shaped [N, channels])
+    sampling_rate, wav_data = tts.infer_fast(prompt_path, text, None)
+    return encode_wav(sampling_rate, wav_data)
+
+def infer_batch_to_bytes(prompt_path: str, texts: list) -> list:
+    """Synthesizes several texts sharing one prompt in a single batched pass."""
+    return [encode_wav(sampling_rate, wav_data) for sampling_rate, wav_data in tts.infer_batch(prompt_path, texts)]
+
+# Micro-batching: requests arriving within a short window (or while the GPU is
+# busy with the previous batch) are grouped by prompt and synthesized together.
+# Inference is GPU-bound and IndexTTS keeps per-instance prompt caches, so the
+# single batcher task runs one synthesis at a time; cache hits never queue.
+synthesis_max_batch = 4
+synthesis_max_wait_seconds = 0.01
+synthesis_queue: asyncio.Queue = asyncio.Queue()
+# cache key -> future of a queued or running synthesis, so concurrent requests
+# for the same prompt and text wait on one synthesis instead of starting another
+inflight_syntheses: Dict[str, asyncio.Future] = {}
+
+async def synthesize(cache_key: str, prompt_path: str, text: str) -> bytes:
+    """Waits for the WAV bytes of cache_key, queuing a synthesis unless one is already in flight."""
+    future = inflight_syntheses.get(cache_key)
+    if future is None:
+        future = asyncio.get_running_loop().create_future()
+        inflight_syntheses[cache_key] = future
+        await synthesis_queue.put((cache_key, prompt_path, text, future))
+    # Shielded: a disconnecting client must not cancel a synthesis others wait on
+    return await asyncio.shield(future)
+
+async def store_synthesized(cache_key: str, wav_bytes: bytes):
+    """Keeps new audio in memory so repeats skip the disk, and persists it in the background for restarts."""
+    cache_meta[cache_key] = {"hits": 0, "last": time.time(), "on_disk": False}
+    await memory_cache_put(cache_key, wav_bytes)
+    schedule_persist(cache_key, os.path.join(tmp_dir, generate_cache_filename(cache_key)), wav_bytes)
+
+async def run_synthesis_group(prompt_path: str, items: list):
+    """Synthesizes (cache_key, text, future) items sharing one prompt and resolves their futures."""
+    texts = [text for _, text, _ in items]
+    results = None
+    if len(texts) > 1:
+        try:
+            results = await asyncio.to_thread(infer_batch_to_bytes, prompt_path, texts)
+        except Exception as e:
+            # One bad or oversized text must not fail the others: retry each alone
+            print(f"Batch synthesis failed, retrying {len(texts)} texts one by one: {e}")
+    for index, (cache_key, text, future) in enumerate(items):
+        if results is not None:
+            outcome = results[index]
+        else:
+            try:
+                outcome = await asyncio.to_thread(infer_to_bytes, prompt_path, text)
+            except Exception as e:
+                outcome = e
+        # Cache before resolving, so no request sees neither the cache nor the future
+        if isinstance(outcome, Exception):
+            future.set_exception(outcome)
+        else:
+            await store_synthesized(cache_key, outcome)
+            future.set_result(outcome)
+        inflight_syntheses.pop(cache_key, None)
+
+async def synthesis_batcher():
+    """Drains up to synthesis_max_batch queued requests and runs them per prompt."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await synthesis_queue.get()]
+        deadline = loop.time() + synthesis_max_wait_seconds
+        while len(batch) < synthesis_max_batch:
+            if not synthesis_queue.empty():
+                batch.append(synthesis_queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(synthesis_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Each cache key is queued once (see inflight_syntheses), so no dedup is needed here
+        groups: Dict[str, list] = {}
+        for cache_key, prompt_path, text, future in batch:
+            groups.setdefault(prompt_path, []).append((cache_key, text, future))
+        # Awaited in turn: the GPU runs one synthesis at a time, and requests
+        # arriving meanwhile form the next batch
+        for prompt_path, items in groups.items():
+            await run_synthesis_group(prompt_path, items)
 
 # Helper to generate a deterministic filename hash for caching
-def generate_cache_filename(ref_audio_path: str, text: str) -> str:
-    """Generates a deterministic filename hash based on prompt and text."""
-    # Create a unique string from prompt filename and text
-    unique_string = f"{ref_audio_path}_{text}"
-    # Hash the string
-    hash_object = hashlib.md5(unique_string.encode())
-    return f"synthesized-{hash_object.hexdigest()}.wav"
-
-@app.api_route("/tts", methods=["GET", "POST"]) # Accept both GET and POST
-async def synthesize_speech(request: Request): # Use Request object to access parameters
+def generate_cache_key(ref_audio_path: str, prompt_mtime: float, text: str) -> str:
+    """Generates a deterministic hex digest based on prompt (name and version) and text."""
+    # Feed the hasher incrementally instead of building a combined string
+    hasher = cache_hasher()
+    hasher.update(ref_audio_path.encode())
+    hasher.update(b"\0")
+    hasher.update(repr(prompt_mtime).encode())
+    hasher.update(b"\0")
+    hasher.update(text.encode())
+    return hasher.hexdigest()[:32]
+
+def generate_cache_filename(cache_key: str) -> str:
+    """Generates the cache filename for a key from generate_cache_key."""
+    return f"synthesized-{cache_key}.wav"
+
+async def synthesize_speech(request: Request) -> Response: # Use Request object to access parameters
     """
     Synthesize speech from text using a pre-stored audio prompt file.
     Accepts GET or POST requests with 'ref_audio_path' and 'text' parameters.
     Returns audio as a binary WAV response.
     """
+    # Starlette adds HEAD to every GET route; never run a synthesis for it
+    if request.method == "HEAD":
+        return Response(status_code=405, headers={"Allow": "GET, POST"})
+
     # Extract parameters from either query (GET) or form (POST)
     if request.method == "POST":
         form_data = await request.form()
@@ -52,82 +440,86 @@ async def synthesize_speech(request: Request): # Use Request object to access pa
 
     # Validate required parameters
     if not ref_audio_path:
-        return JSONResponse(status_code=400, content={"message": "'ref_audio_path' parameter is required."})
+        return FastJSONResponse(status_code=400, content={"message": "'ref_audio_path' parameter is required."})
     if not text:
-        return JSONResponse(status_code=400, content={"message": "'text' parameter is required."})
+        return FastJSONResponse(status_code=400, content={"message": "'text' parameter is required."})
     
+    # Cheap validation before any filesystem work: a bare file name made of word
+    # characters, dots and dashes (no separators, so no directory traversal),
+    # not starting with "." (rejects ".", ".." and hidden files), and a bounded text length
+    if not isinstance(ref_audio_path, str) or not safe_prompt_name_re.fullmatch(ref_audio_path) or ref_audio_path.startswith("."):
+        return FastJSONResponse(status_code=400, content={"message": "Invalid prompt filename provided."})
+    if not isinstance(text, str) or len(text) > max_text_length:
+        return FastJSONResponse(status_code=400, content={"message": f"'text' must be at most {max_text_length} characters."})
+
     # Construct the full path to the prompt file
     prompt_path = os.path.join(prompts_dir, ref_audio_path)
 
-    # Basic security check: ensure the file exists and is within the prompts directory
-    if not os.path.exists(prompt_path):
-        return JSONResponse(status_code=404, content={"message": f"Prompt file not found: {ref_audio_path}"})
-
-    # Optional but recommended: further validation to prevent directory traversal attacks
-    try:
-        if not os.path.realpath(prompt_path).startswith(os.path.realpath(prompts_dir)):
-             return JSONResponse(status_code=400, content={"message": "Invalid prompt filename provided."})
-    except Exception as e:
-        print(f"Path validation error: {e}")
-        return JSONResponse(status_code=500, content={"message": "Internal path validation error."})
+    # Basic security check: ensure the prompt is an existing regular file.
+    # Preloaded prompts are known to exist; others need one stat call.
+    prompt_mtime = preloaded_prompt_mtimes.get(prompt_path)
+    if prompt_mtime is None:
+        prompt_mtime = await asyncio.to_thread(get_prompt_mtime, prompt_path)
+    if prompt_mtime is None:
+        return FastJSONResponse(status_code=404, content={"message": f"Prompt file not found: {ref_audio_path}"})
 
     # --- Caching Logic ---
-    cache_filename = generate_cache_filename(ref_audio_path, text)
-    cached_output_path = os.path.join(tmp_dir, cache_filename)
-
-    # Check if cached file exists and is reasonably recent (e.g., within 1 hour)
-    cache_duration_seconds = 3600 # 1 hour
-    if os.path.exists(cached_output_path):
-        mod_time = os.path.getmtime(cached_output_path)
-        if time.time() - mod_time < cache_duration_seconds:
+    # The prompt's mtime is part of the key, so replacing a prompt WAV gives new
+    # keys (and ETags) instead of serving audio made from the old voice
+    cache_key = generate_cache_key(ref_audio_path, prompt_mtime, text)
+    cached_output_path = os.path.join(tmp_dir, generate_cache_filename(cache_key))
+    # The cache key identifies the prompt + text, so it doubles as the ETag. It is
+    # weak: synthesis is sampled, so re-synthesis after expiry gives different bytes.
+    etag = f'W/"{cache_key}"'
+
+    # The client already holds the audio for this prompt and text: send no body
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        record_cache_access(cache_key)
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": audio_cache_control})
+
+    # Hot prompts are answered straight from memory without touching the disk
+    cached_audio = await memory_cache_get(cache_key)
+    if cached_audio is not None:
+        record_cache_access(cache_key)
+        print(f"Returning in-memory cached audio: {cache_key}")
+        return audio_bytes_response(cached_audio, etag)
+
+    # Known keys need no stat: the janitor removes the file when the entry expires
+    meta = cache_meta.get(cache_key)
+    if meta is not None and meta["on_disk"]:
+        record_cache_access(cache_key)
+        print(f"Returning cached file: {cached_output_path}")
+        # Streamed by FileResponse (zero-copy only under a pathsend-capable server)
+        return audio_file_response(cached_output_path, etag)
+    if meta is None:
+        # The file may be left over from a previous run
+        mod_time = await asyncio.to_thread(get_cache_file_mtime, cached_output_path)
+        if mod_time is not None and time.time() - mod_time < cache_base_ttl_seconds:
+            cache_meta[cache_key] = {"hits": 0, "last": time.time(), "on_disk": True}
             print(f"Returning cached file: {cached_output_path}")
-            # Use FileResponse for direct file sending, which is often more efficient
-            return FileResponse(cached_output_path, media_type="audio/wav")
-        else:
-            # Cache is old, remove it
-            try:
-                os.unlink(cached_output_path)
-                print(f"Expired cache file removed: {cached_output_path}")
-            except Exception as e:
-                 print(f"Error removing expired cache file {cached_output_path}: {e}")
+            return audio_file_response(cached_output_path, etag)
 
     # --- Synthesis if not cached ---
-    temp_output_file = None
     try:
-        # Use the cache path directly as the output path for synthesis
-        # This saves a copy operation later
-        output_path = cached_output_path
-        # Ensure the tmp directory exists
-        os.makedirs(tmp_dir, exist_ok=True)
-
-
         # Perform inference
         print(f"Synthesizing text: '{text[:50]}...' with prompt file: {prompt_path}")
-        # Using infer_fast for potentially better performance on longer texts
-        # Pass the constructed prompt_path and the cache path as output_path
-        tts.infer_fast(audio_prompt=prompt_path, text=text, output_path=output_path)
-        print(f"Synthesis complete. Output saved to: {output_path}")
-
-        # Return the audio as a file response directly from the saved file
-        return FileResponse(output_path, media_type="audio/wav")
+        # The batcher groups this request with concurrent ones sharing the same
+        # prompt, runs inference in a worker thread so the event loop keeps
+        # serving other requests, and caches the result.
+        wav_bytes = await synthesize(cache_key, prompt_path, text)
+        print(f"Synthesis complete. {len(wav_bytes)} bytes of audio generated")
+        return audio_bytes_response(wav_bytes, etag)
 
+    except NoSentencesError as e:
+        # e.g. text made only of punctuation; the same whether batched or not
+        return FastJSONResponse(status_code=400, content={"message": f"'text' contains nothing to synthesize: {e}"})
     except Exception as e:
         print(f"An error occurred during synthesis: {e}")
-        # Attempt to clean up the failed output file
-        if os.path.exists(output_path):
-             try:
-                 os.unlink(output_path)
-                 print(f"Cleaned up failed output file: {output_path}")
-             except Exception as cleanup_e:
-                 print(f"Error cleaning up failed output file {output_path}: {cleanup_e}")
-        return JSONResponse(status_code=500, content={"message": f"Internal server error: {e}"})
-    # Note: No 'finally' cleanup needed for the output file when using FileResponse
-    # FastAPI handles sending the file and the OS manages temporary files if they were truly temporary.
-    # Here, we're saving to a semi-permanent cache path, so explicit cleanup is handled by the cache logic or a separate process if needed.
-
-# Ensure the tmp directory exists for caching
-tmp_dir = Path(f'{os.path.dirname(__file__)}/tmp').as_posix() # Define tmp_dir relative to the script
-os.makedirs(tmp_dir, exist_ok=True)
+        return FastJSONResponse(status_code=500, content={"message": f"Internal server error: {e}"})
+
+# Registered as a plain Starlette route: the endpoint only needs the raw Request,
+# so FastAPI's dependency injection and validation would be pure overhead.
+app.add_route("/tts", synthesize_speech, methods=["GET", "POST"], include_in_schema=False) # Accept both GET and POST
 
 
 if __name__ == "__main__":
@@ -135,4 +527,18 @@ if __name__ == "__main__":
     host = "127.0.0.1"
     port = 8000
     print(f'\n启动api: http://{host}:{port}\n')
-    uvicorn.run(app, host=host, port=port)
\ No newline at end of file
+    # Prefer the C-accelerated event loop and HTTP parser when installed
+    # (pip install uvloop httptools), falling back to the pure-Python ones.
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    # A single worker: the GPU model cannot be shared across processes, and
+    # concurrency is handled by the worker thread + synthesis batcher above.
+    uvicorn.run(app, host=host, port=port, loop=loop, http=http, workers=1, log_level="warning")
\ No newline at end of file
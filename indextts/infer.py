@@ -25,6 +25,10 @@ from indextts.utils.feature_extractors import MelSpectrogramFeatures
 from indextts.utils.front import TextNormalizer, TextTokenizer
 
 
+class NoSentencesError(ValueError):
+    """文本切分后没有可合成的句子（例如只有标点），无法生成音频"""
+
+
 class IndexTTS:
     def __init__(
         self, cfg_path="checkpoints/config.yaml", model_dir="checkpoints", is_fp16=True, device=None, use_cuda_kernel=None,
@@ -125,6 +129,11 @@ class IndexTTS:
         # 缓存参考音频mel：
         self.cache_audio_prompt = None
         self.cache_cond_mel = None
+        # 预加载的参考音频mel，{audio_prompt: cond_mel}
+        self.preloaded_cond_mels = {}
+        # 复用 mel 特征提取器和重采样器（按原始采样率缓存），避免每次重新构建滤波器组/重采样核
+        self.mel_extractor = MelSpectrogramFeatures()
+        self.resamplers = {}
         # 进度引用显示（可选）
         self.gr_progress = None
 
@@ -172,9 +181,10 @@ class IndexTTS:
         code_lens = torch.LongTensor(code_lens).to(device, dtype=dtype)
         return codes, code_lens
 
-    def bucket_sentences(self, sentences, enable=False):
+    def bucket_sentences(self, sentences, enable=False, max_bucket_size=None):
         """
         Sentence data bucketing
+        max_bucket_size: 每个桶最多的句子数，超过时拆分成多个桶，限制单次 gpt 推理的 batch 大小
         """
         max_len = max(len(s) for s in sentences)
         half = max_len // 2
@@ -184,7 +194,10 @@ class IndexTTS:
                 outputs[0].append({"idx": idx, "sent": sent})
             else:
                 outputs[1].append({"idx": idx, "sent": sent})
-        return [item for item in outputs if item]
+        outputs = [item for item in outputs if item]
+        if max_bucket_size:
+            outputs = [item[i : i + max_bucket_size] for item in outputs for i in range(0, len(item), max_bucket_size)]
+        return outputs
 
     def pad_tokens_cat(self, tokens: List[torch.Tensor]):
         if len(tokens) <= 1:
@@ -211,10 +224,131 @@ class IndexTTS:
         except Exception as e:
             pass
 
+    def load_cond_mel(self, audio_prompt):
+        """
+        读取参考音频并计算 cond_mel
+        """
+        audio, sr = torchaudio.load(audio_prompt)
+        audio = torch.mean(audio, dim=0, keepdim=True)
+        if audio.shape[0] > 1:
+            audio = audio[0].unsqueeze(0)
+        resampler = self.resamplers.get(sr)
+        if resampler is None:
+            resampler = torchaudio.transforms.Resample(sr, 24000)
+            self.resamplers[sr] = resampler
+        audio = resampler(audio)
+        return self.mel_extractor(audio).to(self.device)
+
+    def preload_audio_prompts(self, audio_prompts):
+        """
+        预先计算一批参考音频的 cond_mel，推理时直接使用，跳过音频读取和解码
+        """
+        for audio_prompt in audio_prompts:
+            self.preloaded_cond_mels[audio_prompt] = self.load_cond_mel(audio_prompt)
+
+    def get_cond_mel(self, audio_prompt, verbose=False):
+        cond_mel = self.preloaded_cond_mels.get(audio_prompt)
+        if cond_mel is not None:
+            return cond_mel
+        # 如果参考音频改变了，才需要重新生成 cond_mel, 提升速度
+        if self.cache_cond_mel is None or self.cache_audio_prompt != audio_prompt:
+            cond_mel = self.load_cond_mel(audio_prompt)
+            if verbose:
+                print(f"cond_mel shape: {cond_mel.shape}", "dtype:", cond_mel.dtype)
+
+            self.cache_audio_prompt = audio_prompt
+            self.cache_cond_mel = cond_mel
+        return self.cache_cond_mel
+
     def _set_gr_progress(self, value, desc):
         if self.gr_progress is not None:
             self.gr_progress(value, desc=desc)
 
+    def tokenize_buckets(self, all_sentences, verbose=False):
+        """
+        将分桶后的句子转换为 text_tokens，保持与分桶结果相同的结构
+        """
+        all_text_tokens: List[List[torch.Tensor]] = []
+        for bucket in all_sentences:
+            temp_tokens: List[torch.Tensor] = []
+            all_text_tokens.append(temp_tokens)
+            for item in bucket:
+                sent = item["sent"]
+                text_tokens = self.tokenizer.convert_tokens_to_ids(sent)
+                text_tokens = torch.tensor(text_tokens, dtype=torch.int32, device=self.device).unsqueeze(0)
+                if verbose:
+                    print(text_tokens)
+                    print(f"text_tokens shape: {text_tokens.shape}, text_tokens type: {text_tokens.dtype}")
+                    # debug tokenizer
+                    text_token_syms = self.tokenizer.convert_ids_to_tokens(text_tokens[0].tolist())
+                    print("text_token_syms is same as sentence tokens", text_token_syms == sent)
+                temp_tokens.append(text_tokens)
+        return all_text_tokens
+
+    def generate_codes(self, auto_conditioning, item_tokens: List[torch.Tensor]):
+        """
+        一个桶内的句子拼成一个 batch，执行 gpt inference_speech，返回 codes [batch, x]
+        """
+        top_p = 0.8
+        top_k = 30
+        temperature = 1.0
+        autoregressive_batch_size = 1
+        length_penalty = 0.0
+        num_beams = 3
+        repetition_penalty = 10.0
+        max_mel_tokens = 600
+
+        batch_num = len(item_tokens)
+        batch_text_tokens = self.pad_tokens_cat(item_tokens)
+        cond_mel_lengths = torch.tensor([auto_conditioning.shape[-1]], device=self.device)
+        batch_cond_mel_lengths = torch.cat([cond_mel_lengths] * batch_num, dim=0)
+        batch_auto_conditioning = torch.cat([auto_conditioning] * batch_num, dim=0)
+        with torch.no_grad():
+            with torch.amp.autocast(batch_text_tokens.device.type, enabled=self.dtype is not None, dtype=self.dtype):
+                codes = self.gpt.inference_speech(batch_auto_conditioning, batch_text_tokens,
+                                    cond_mel_lengths=batch_cond_mel_lengths,
+                                    # text_lengths=text_len,
+                                    do_sample=True,
+                                    top_p=top_p,
+                                    top_k=top_k,
+                                    temperature=temperature,
+                                    num_return_sequences=autoregressive_batch_size,
+                                    length_penalty=length_penalty,
+                                    num_beams=num_beams,
+                                    repetition_penalty=repetition_penalty,
+                                    max_generate_length=max_mel_tokens)
+        return codes
+
+    def compute_latent(self, auto_conditioning, codes: torch.Tensor, text_tokens: torch.Tensor):
+        """
+        清理单个句子的 codes（去掉 stop token、连续重复和过长静音），再经 gpt 前向得到 latent
+        """
+        codes = codes[codes != self.cfg.gpt.stop_mel_token]  # [x]
+        codes, _ = torch.unique_consecutive(codes, return_inverse=True)
+        codes = codes.unsqueeze(0)  # [x] -> [1, x]
+        codes, code_lens = self.remove_long_silence(codes, silent_token=52, max_consecutive=30)
+        with torch.no_grad():
+            with torch.amp.autocast(text_tokens.device.type, enabled=self.dtype is not None, dtype=self.dtype):
+                latent = \
+                    self.gpt(auto_conditioning, text_tokens,
+                                torch.tensor([text_tokens.shape[-1]], device=text_tokens.device), codes,
+                                code_lens*self.gpt.mel_length_compression,
+                                cond_mel_lengths=torch.tensor([auto_conditioning.shape[-1]], device=text_tokens.device),
+                                return_latent=True, clip_inputs=False)
+        return latent
+
+    def decode_latents(self, auto_conditioning, latents: List[torch.Tensor]):
+        """
+        拼接一个 chunk 内的 latent，用 bigvgan 解码，返回放大到 int16 范围的 cpu wav
+        """
+        latent = torch.cat(latents, dim=1)
+        with torch.no_grad():
+            with torch.amp.autocast(latent.device.type, enabled=self.dtype is not None, dtype=self.dtype):
+                wav, _ = self.bigvgan(latent, auto_conditioning.transpose(1, 2))
+                wav = wav.squeeze(1)
+        wav = torch.clamp(32767 * wav, -32767.0, 32767.0)
+        return wav.cpu() # to cpu before saving
+
     # 快速推理：对于“多句长文本”，可实现至少 2~10 倍以上的速度提升~ （First modified by sunnyboxs 2025-04-16）
     def infer_fast(self, audio_prompt, text, output_path, verbose=False):
         print(">> start fast inference...")
@@ -223,27 +357,10 @@ class IndexTTS:
             print(f"origin text:{text}")
         start_time = time.perf_counter()
 
-        # 如果参考音频改变了，才需要重新生成 cond_mel, 提升速度
-        if self.cache_cond_mel is None or self.cache_audio_prompt != audio_prompt:
-            audio, sr = torchaudio.load(audio_prompt)
-            audio = torch.mean(audio, dim=0, keepdim=True)
-            if audio.shape[0] > 1:
-                audio = audio[0].unsqueeze(0)
-            audio = torchaudio.transforms.Resample(sr, 24000)(audio)
-            cond_mel = MelSpectrogramFeatures()(audio).to(self.device)
-            cond_mel_frame = cond_mel.shape[-1]
-            if verbose:
-                print(f"cond_mel shape: {cond_mel.shape}", "dtype:", cond_mel.dtype)
-
-            self.cache_audio_prompt = audio_prompt
-            self.cache_cond_mel = cond_mel
-        else:
-            cond_mel = self.cache_cond_mel
-            cond_mel_frame = cond_mel.shape[-1]
-            pass
+        cond_mel = self.get_cond_mel(audio_prompt, verbose=verbose)
+        cond_mel_frame = cond_mel.shape[-1]
 
         auto_conditioning = cond_mel
-        cond_mel_lengths = torch.tensor([cond_mel_frame], device=self.device)
 
         # text_tokens
         text_tokens_list = self.tokenizer.tokenize(text)
@@ -252,15 +369,9 @@ class IndexTTS:
             print("text token count:", len(text_tokens_list))
             print("sentences count:", len(sentences))
             print(*sentences, sep="\n")
+        if not sentences:
+            raise NoSentencesError(f"no sentences to synthesize in text: {text!r}")
 
-        top_p = 0.8
-        top_k = 30
-        temperature = 1.0
-        autoregressive_batch_size = 1
-        length_penalty = 0.0
-        num_beams = 3
-        repetition_penalty = 10.0
-        max_mel_tokens = 600
         sampling_rate = 24000
         # lang = "EN"
         # lang = "ZH"
@@ -270,85 +381,34 @@ class IndexTTS:
         bigvgan_time = 0
 
         # text processing
-        all_text_tokens: List[List[torch.Tensor]] = []
         self._set_gr_progress(0.1, "text processing...")
         bucket_enable = True # 预分桶开关，优先保证质量=True。优先保证速度=False。
-        all_sentences = self.bucket_sentences(sentences, enable=bucket_enable) 
-        for sentences in all_sentences:
-            temp_tokens: List[torch.Tensor] = []
-            all_text_tokens.append(temp_tokens)
-            for item in sentences:
-                sent = item["sent"]
-                text_tokens = self.tokenizer.convert_tokens_to_ids(sent)
-                text_tokens = torch.tensor(text_tokens, dtype=torch.int32, device=self.device).unsqueeze(0)
-                if verbose:
-                    print(text_tokens)
-                    print(f"text_tokens shape: {text_tokens.shape}, text_tokens type: {text_tokens.dtype}")
-                    # debug tokenizer
-                    text_token_syms = self.tokenizer.convert_ids_to_tokens(text_tokens[0].tolist())
-                    print("text_token_syms is same as sentence tokens", text_token_syms == sent) 
-                temp_tokens.append(text_tokens)
-        
-            
+        all_sentences = self.bucket_sentences(sentences, enable=bucket_enable)
+        all_text_tokens = self.tokenize_buckets(all_sentences, verbose=verbose)
+
         # Sequential processing of bucketing data
         all_batch_num = 0
         all_batch_codes = []
         for item_tokens in all_text_tokens:
-            batch_num = len(item_tokens)
-            batch_text_tokens = self.pad_tokens_cat(item_tokens)
-            batch_cond_mel_lengths = torch.cat([cond_mel_lengths] * batch_num, dim=0)
-            batch_auto_conditioning = torch.cat([auto_conditioning] * batch_num, dim=0)
-            all_batch_num += batch_num
+            all_batch_num += len(item_tokens)
 
             # gpt speech
             self._set_gr_progress(0.2, "gpt inference speech...")
             m_start_time = time.perf_counter()
-            with torch.no_grad():
-                with torch.amp.autocast(batch_text_tokens.device.type, enabled=self.dtype is not None, dtype=self.dtype):
-                    temp_codes = self.gpt.inference_speech(batch_auto_conditioning, batch_text_tokens,
-                                        cond_mel_lengths=batch_cond_mel_lengths,
-                                        # text_lengths=text_len,
-                                        do_sample=True,
-                                        top_p=top_p,
-                                        top_k=top_k,
-                                        temperature=temperature,
-                                        num_return_sequences=autoregressive_batch_size,
-                                        length_penalty=length_penalty,
-                                        num_beams=num_beams,
-                                        repetition_penalty=repetition_penalty,
-                                        max_generate_length=max_mel_tokens)
-                    all_batch_codes.append(temp_codes)
+            all_batch_codes.append(self.generate_codes(auto_conditioning, item_tokens))
             gpt_gen_time += time.perf_counter() - m_start_time
 
         # gpt latent
         self._set_gr_progress(0.5, "gpt inference latents...")
-        all_idxs = []
-        all_latents = []
+        all_latents = [None] * len(sentences)
         for batch_codes, batch_tokens, batch_sentences in zip(all_batch_codes, all_text_tokens, all_sentences):
             for i in range(batch_codes.shape[0]):
-                codes = batch_codes[i]  # [x]
-                codes = codes[codes != self.cfg.gpt.stop_mel_token]
-                codes, _ = torch.unique_consecutive(codes, return_inverse=True)
-                codes = codes.unsqueeze(0)  # [x] -> [1, x]
-                code_lens = torch.tensor([codes.shape[-1]], device=codes.device, dtype=codes.dtype)
-                codes, code_lens = self.remove_long_silence(codes, silent_token=52, max_consecutive=30)
-                text_tokens = batch_tokens[i]
-                all_idxs.append(batch_sentences[i]["idx"])
                 m_start_time = time.perf_counter()
-                with torch.no_grad():
-                    with torch.amp.autocast(text_tokens.device.type, enabled=self.dtype is not None, dtype=self.dtype):
-                        latent = \
-                            self.gpt(auto_conditioning, text_tokens,
-                                        torch.tensor([text_tokens.shape[-1]], device=text_tokens.device), codes,
-                                        code_lens*self.gpt.mel_length_compression,
-                                        cond_mel_lengths=torch.tensor([auto_conditioning.shape[-1]], device=text_tokens.device),
-                                        return_latent=True, clip_inputs=False)
-                        gpt_forward_time += time.perf_counter() - m_start_time
-                        all_latents.append(latent)
+                all_latents[batch_sentences[i]["idx"]] = self.compute_latent(auto_conditioning, batch_codes[i], batch_tokens[i])
+                gpt_forward_time += time.perf_counter() - m_start_time
 
         # bigvgan chunk
         chunk_size = 2
-        all_latents = [all_latents[all_idxs.index(i)] for i in range(len(all_latents))]
         chunk_latents = [all_latents[i : i + chunk_size] for i in range(0, len(all_latents), chunk_size)]
         chunk_length = len(chunk_latents)
         latent_length = len(all_latents)
@@ -359,16 +419,9 @@ class IndexTTS:
         tqdm_progress = tqdm(total=latent_length, desc="bigvgan")
         for items in chunk_latents:
             tqdm_progress.update(len(items))
-            latent = torch.cat(items, dim=1)
-            with torch.no_grad():
-                with torch.amp.autocast(latent.device.type, enabled=self.dtype is not None, dtype=self.dtype):
-                    m_start_time = time.perf_counter()
-                    wav, _ = self.bigvgan(latent, auto_conditioning.transpose(1, 2))
-                    bigvgan_time += time.perf_counter() - m_start_time
-                    wav = wav.squeeze(1)
-                    pass
-            wav = torch.clamp(32767 * wav, -32767.0, 32767.0)
-            wavs.append(wav.cpu()) # to cpu before saving
+            m_start_time = time.perf_counter()
+            wavs.append(self.decode_latents(auto_conditioning, items))
+            bigvgan_time += time.perf_counter() - m_start_time
 
         # clear cache
         tqdm_progress.close()  # 确保进度条被关闭
@@ -404,6 +457,69 @@ class IndexTTS:
             wav_data = wav_data.numpy().T
             return (sampling_rate, wav_data)
 
+    # 批量推理：多条文本共享同一参考音频，所有句子统一分桶、批量推理，按文本分别返回音频
+    def infer_batch(self, audio_prompt, texts, verbose=False, max_bucket_size=8):
+        """
+        Args:
+            audio_prompt (str): path to the reference audio, shared by all texts.
+            texts (List[str]): texts to synthesize.
+            max_bucket_size (int): max sentences per gpt batch (each is expanded by num_beams), caps peak memory.
+        Returns:
+            List[Tuple[int, np.ndarray]]: (sampling_rate, int16 wav data of shape [N, 1]) for each text, in order.
+        Raises:
+            NoSentencesError: if any text has no sentences to synthesize (e.g. only punctuation).
+        """
+        print(f">> start batch inference, texts: {len(texts)}")
+        start_time = time.perf_counter()
+
+        auto_conditioning = self.get_cond_mel(audio_prompt, verbose=verbose)
+        sampling_rate = 24000
+
+        # 展平所有文本的句子，并记录每个句子属于哪条文本
+        sentences = []
+        owners = []
+        for text_idx, text in enumerate(texts):
+            text_tokens_list = self.tokenizer.tokenize(text)
+            text_sentences = self.tokenizer.split_sentences(text_tokens_list)
+            # 没有句子的文本无法生成音频，与 infer_fast 一致直接报错，而不是返回空音频
+            if not text_sentences:
+                raise NoSentencesError(f"no sentences to synthesize in text {text_idx}: {text!r}")
+            for sent in text_sentences:
+                sentences.append(sent)
+                owners.append(text_idx)
+        if verbose:
+            print("sentences count:", len(sentences))
+
+        # text processing
+        all_sentences = self.bucket_sentences(sentences, enable=True, max_bucket_size=max_bucket_size)
+        all_text_tokens = self.tokenize_buckets(all_sentences)
+
+        # gpt speech & gpt latent
+        latents = [None] * len(sentences)
+        for item_tokens, batch_sentences in zip(all_text_tokens, all_sentences):
+            batch_codes = self.generate_codes(auto_conditioning, item_tokens)
+            for i in range(batch_codes.shape[0]):
+                latents[batch_sentences[i]["idx"]] = self.compute_latent(auto_conditioning, batch_codes[i], item_tokens[i])
+
+        # bigvgan chunk decode, 每条文本单独解码
+        chunk_size = 2
+        results = []
+        for text_idx in range(len(texts)):
+            text_latents = [latent for latent, owner in zip(latents, owners) if owner == text_idx]
+            wavs = [
+                self.decode_latents(auto_conditioning, text_latents[i : i + chunk_size])
+                for i in range(0, len(text_latents), chunk_size)
+            ]
+            wav = torch.cat(wavs, dim=1)
+            results.append((sampling_rate, wav.type(torch.int16).numpy().T))
+
+        latents = None
+        self.torch_empty_cache()
+        end_time = time.perf_counter()
+        print(f">> Total batch inference time: {end_time - start_time:.2f} seconds")
+        print(f">> [batch] texts: {len(texts)} sentences: {len(sentences)} buckets: {len(all_sentences)}")
+        return results
+
     # 原始推理模式
     def infer(self, audio_prompt, text, output_path, verbose=False):
         print(">> start inference...")
@@ -412,24 +528,8 @@ class IndexTTS:
             print(f"origin text:{text}")
         start_time = time.perf_counter()
 
-        # 如果参考音频改变了，才需要重新生成 cond_mel, 提升速度
-        if self.cache_cond_mel is None or self.cache_audio_prompt != audio_prompt:
-            audio, sr = torchaudio.load(audio_prompt)
-            audio = torch.mean(audio, dim=0, keepdim=True)
-            if audio.shape[0] > 1:
-                audio = audio[0].unsqueeze(0)
-            audio = torchaudio.transforms.Resample(sr, 24000)(audio)
-            cond_mel = MelSpectrogramFeatures()(audio).to(self.device)
-            cond_mel_frame = cond_mel.shape[-1]
-            if verbose:
-                print(f"cond_mel shape: {cond_mel.shape}", "dtype:", cond_mel.dtype)
-
-            self.cache_audio_prompt = audio_prompt
-            self.cache_cond_mel = cond_mel
-        else:
-            cond_mel = self.cache_cond_mel
-            cond_mel_frame = cond_mel.shape[-1]
-            pass
+        cond_mel = self.get_cond_mel(audio_prompt, verbose=verbose)
+        cond_mel_frame = cond_mel.shape[-1]
 
         auto_conditioning = cond_mel
         text_tokens_list = self.tokenizer.tokenize(text)
@@ -2,12 +2,23 @@
 import os
 import traceback
 import re
+from functools import lru_cache
 from typing import List, Union, overload
 import warnings
 from indextts.utils.common import tokenize_by_CJK_char, de_tokenized_by_CJK_char
 from sentencepiece import SentencePieceProcessor
 
 
+class NormalizeFallback(Exception):
+    """
+    规范化器抛出异常时使用，携带兜底结果；异常不会被 lru_cache 缓存
+    """
+
+    def __init__(self, result: str):
+        super().__init__(result)
+        self.result = result
+
+
 class TextNormalizer:
     def __init__(self):
         self.zh_normalizer = None
@@ -53,11 +64,45 @@ class TextNormalizer:
             "$": ".",
             **self.char_rep_map,
         }
+        # 预编译替换表，避免每次 normalize 都重新编译
+        self.char_rep_table, self.char_rep_pattern, self.char_rep_multi_keys = self.build_char_rep(self.char_rep_map)
+        (
+            self.zh_char_rep_table,
+            self.zh_char_rep_pattern,
+            self.zh_char_rep_multi_keys,
+        ) = self.build_char_rep(self.zh_char_rep_map)
+        # 相同文本的规范化结果是确定的，缓存起来，重复文本直接命中
+        self._normalize_cached = lru_cache(maxsize=4096)(self._normalize)
+
+    @staticmethod
+    def build_char_rep(rep_map):
+        """
+        将替换表拆分为：单字符部分 -> str.translate 转换表，多字符部分 -> 正则及其 key 列表
+        多字符的 key 若被排在前面的 key 作为前缀遮挡（如 "，，，" 被 "，" 遮挡），原本就不会被匹配，直接丢弃
+        """
+        keys = list(rep_map.keys())
+        table = str.maketrans({k: v for k, v in rep_map.items() if len(k) == 1})
+        multi_keys = [
+            k for i, k in enumerate(keys) if len(k) > 1 and not any(k.startswith(p) for p in keys[:i])
+        ]
+        pattern = re.compile("|".join(re.escape(k) for k in multi_keys)) if multi_keys else None
+        return table, pattern, tuple(multi_keys)
+
+    @staticmethod
+    def replace_chars(text, rep_map, table, pattern, multi_keys):
+        """
+        先替换多字符序列（如 "..." -> "…"），再用 str.translate 一次性替换单字符
+        多字符序列很少出现，先用子串查找判断，不存在时跳过正则，只做一次 translate
+        """
+        if pattern is not None and any(k in text for k in multi_keys):
+            text = pattern.sub(lambda x: rep_map[x.group()], text)
+        return text.translate(table)
+
+    # 正则表达式匹配邮箱格式：数字英文@数字英文.英文
+    EMAIL_RE = re.compile(r"^[a-zA-Z0-9]+@[a-zA-Z0-9]+\.[a-zA-Z]+$")
 
     def match_email(self, email):
-        # 正则表达式匹配邮箱格式：数字英文@数字英文.英文
-        pattern = r"^[a-zA-Z0-9]+@[a-zA-Z0-9]+\.[a-zA-Z]+$"
-        return re.match(pattern, email) is not None
+        return TextNormalizer.EMAIL_RE.match(email) is not None
 
     """
     匹配拼音声调格式：pinyin+数字，声调1-5，5表示轻声
@@ -69,15 +114,22 @@ class TextNormalizer:
     例如：克里斯托弗·诺兰，约瑟夫·高登-莱维特
     """
     NAME_PATTERN = r"[\u4e00-\u9fff]+([-·—][\u4e00-\u9fff]+){1,2}"
+    # 预编译的正则，只在类加载时编译一次
+    PINYIN_TONE_RE = re.compile(PINYIN_TONE_PATTERN, re.IGNORECASE)
+    NAME_RE = re.compile(NAME_PATTERN, re.IGNORECASE)
+    CHINESE_CHAR_RE = re.compile(r"[\u4e00-\u9fff]")
+    ALPHA_RE = re.compile(r"[a-zA-Z]")
+    # 匹配 jqx 的韵母为 u/ü 的拼音
+    JQX_U_RE = re.compile(r"([jqx])[uü](n|e|an)*(\d)", re.IGNORECASE)
+    # 匹配人名、拼音占位符 <n_a>、<pinyin_a>
+    PLACEHOLDER_RE = re.compile(r"<(?:n|pinyin)_.>")
 
     def use_chinese(self, s):
-        has_chinese = bool(re.search(r"[\u4e00-\u9fff]", s))
-        has_alpha = bool(re.search(r"[a-zA-Z]", s))
-        is_email = self.match_email(s)
-        if has_chinese or not has_alpha or is_email:
+        # 按开销由低到高短路判断
+        if TextNormalizer.CHINESE_CHAR_RE.search(s) or not TextNormalizer.ALPHA_RE.search(s) or self.match_email(s):
             return True
 
-        has_pinyin = bool(re.search(TextNormalizer.PINYIN_TONE_PATTERN, s, re.IGNORECASE))
+        has_pinyin = bool(TextNormalizer.PINYIN_TONE_RE.search(s))
         return has_pinyin
 
     def load(self):
@@ -96,11 +148,21 @@ class TextNormalizer:
 
             self.zh_normalizer = NormalizerZh(remove_interjections=False, remove_erhua=False, overwrite_cache=False)
             self.en_normalizer = NormalizerEn(overwrite_cache=False)
+        # 规范化器变了，旧的缓存结果作废
+        self._normalize_cached.cache_clear()
 
     def normalize(self, text: str) -> str:
         if not self.zh_normalizer or not self.en_normalizer:
             print("Error, text normalizer is not initialized !!!")
             return ""
+        try:
+            return self._normalize_cached(text)
+        except NormalizeFallback as e:
+            # 失败的结果不缓存，下次相同文本会重新规范化
+            return e.result
+
+    def _normalize(self, text: str) -> str:
+        failed = False
         if self.use_chinese(text):
             replaced_text, pinyin_list = self.save_pinyin_tones(text.rstrip())
             
@@ -109,21 +171,25 @@ class TextNormalizer:
                 result = self.zh_normalizer.normalize(replaced_text)
             except Exception:
                 result = ""
+                failed = True
                 print(traceback.format_exc())
-            # 恢复人名
-            result = self.restore_names(result, original_name_list)
-            # 恢复拼音声调
-            result = self.restore_pinyin_tones(result, pinyin_list)
-            pattern = re.compile("|".join(re.escape(p) for p in self.zh_char_rep_map.keys()))
-            result = pattern.sub(lambda x: self.zh_char_rep_map[x.group()], result)
+            # 一次遍历同时恢复人名和拼音声调
+            result = self.restore_placeholders(result, original_name_list, pinyin_list)
+            result = self.replace_chars(
+                result, self.zh_char_rep_map, self.zh_char_rep_table, self.zh_char_rep_pattern, self.zh_char_rep_multi_keys
+            )
         else:
             try:
                 result = self.en_normalizer.normalize(text)
             except Exception:
                 result = text
+                failed = True
                 print(traceback.format_exc())
-            pattern = re.compile("|".join(re.escape(p) for p in self.char_rep_map.keys()))
-            result = pattern.sub(lambda x: self.char_rep_map[x.group()], result)
+            result = self.replace_chars(
+                result, self.char_rep_map, self.char_rep_table, self.char_rep_pattern, self.char_rep_multi_keys
+            )
+        if failed:
+            raise NormalizeFallback(result)
         return result
 
     def correct_pinyin(self, pinyin: str):
@@ -133,10 +199,8 @@ class TextNormalizer:
         """
         if pinyin[0] not in "jqxJQX":
             return pinyin
-        # 匹配 jqx 的韵母为 u/ü 的拼音
-        pattern = r"([jqx])[uü](n|e|an)*(\d)"
         repl = r"\g<1>v\g<2>\g<3>"
-        pinyin = re.sub(pattern, repl, pinyin, flags=re.IGNORECASE)
+        pinyin = TextNormalizer.JQX_U_RE.sub(repl, pinyin)
         return pinyin.upper()
 
     def save_names(self, original_text):
@@ -145,8 +209,7 @@ class TextNormalizer:
         例如：克里斯托弗·诺兰 -> <n_a>
         """
         # 人名
-        name_pattern = re.compile(TextNormalizer.NAME_PATTERN, re.IGNORECASE)
-        original_name_list = re.findall(name_pattern, original_text)
+        original_name_list = TextNormalizer.NAME_RE.findall(original_text)
         if len(original_name_list) == 0:
             return (original_text, None)
         original_name_list = list(set("".join(n) for n in original_name_list))
@@ -158,6 +221,21 @@ class TextNormalizer:
 
         return transformed_text, original_name_list
 
+    def restore_placeholders(self, normalized_text, original_name_list, original_pinyin_list):
+        """
+        单次正则替换同时恢复人名和拼音，结果与依次调用 restore_names、restore_pinyin_tones 相同
+        例如：<n_a> -> original_name_list[0]，<pinyin_a> -> original_pinyin_list[0]
+        """
+        if not original_name_list and not original_pinyin_list:
+            return normalized_text
+
+        replacements = {}
+        for i, name in enumerate(original_name_list or []):
+            replacements[f"<n_{chr(ord('a') + i)}>"] = name
+        for i, pinyin in enumerate(original_pinyin_list or []):
+            replacements[f"<pinyin_{chr(ord('a') + i)}>"] = self.correct_pinyin(pinyin)
+        return TextNormalizer.PLACEHOLDER_RE.sub(lambda x: replacements.get(x.group(), x.group()), normalized_text)
+
     def restore_names(self, normalized_text, original_name_list):
         """
         恢复人名为原来的文字
@@ -179,8 +257,7 @@ class TextNormalizer:
         例如：xuan4 -> <pinyin_a>
         """
         # 声母韵母+声调数字
-        origin_pinyin_pattern = re.compile(TextNormalizer.PINYIN_TONE_PATTERN, re.IGNORECASE)
-        original_pinyin_list = re.findall(origin_pinyin_pattern, original_text)
+        original_pinyin_list = TextNormalizer.PINYIN_TONE_RE.findall(original_text)
         if len(original_pinyin_list) == 0:
             return (original_text, None)
         original_pinyin_list = list(set("".join(p) for p in original_pinyin_list))
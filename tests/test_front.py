@@ -0,0 +1,61 @@
+import random
+import re
+
+from indextts.utils.front import TextNormalizer
+
+
+def reference_replace_chars(text, rep_map):
+    # 原始实现：所有 key 组成一个正则，逐个匹配替换
+    pattern = re.compile("|".join(re.escape(k) for k in rep_map.keys()))
+    return pattern.sub(lambda x: rep_map[x.group()], text)
+
+
+def test_restore_placeholders_matches_two_stage_restore():
+    normalizer = TextNormalizer()
+    cases = [
+        "约瑟夫·高登-莱维特说xuan4和jue2",
+        "克里斯托弗·诺兰，约瑟夫·高登-莱维特",
+        "受不liao3你了, ju3 que4 xün1",
+        "未知占位符 <n_z> <pinyin_z> 保持不变",
+        "没有人名也没有拼音",
+    ]
+    for text in cases:
+        replaced_text, pinyin_list = normalizer.save_pinyin_tones(text)
+        replaced_text, name_list = normalizer.save_names(replaced_text)
+        expected = normalizer.restore_pinyin_tones(normalizer.restore_names(replaced_text, name_list), pinyin_list)
+        assert normalizer.restore_placeholders(replaced_text, name_list, pinyin_list) == expected
+
+
+def test_replace_chars_matches_single_regex_replacement():
+    normalizer = TextNormalizer()
+    rep_sets = [
+        (normalizer.char_rep_map, normalizer.char_rep_table, normalizer.char_rep_pattern, normalizer.char_rep_multi_keys),
+        (
+            normalizer.zh_char_rep_map,
+            normalizer.zh_char_rep_table,
+            normalizer.zh_char_rep_pattern,
+            normalizer.zh_char_rep_multi_keys,
+        ),
+    ]
+    alphabet = list("".join(normalizer.zh_char_rep_map.keys())) + list("ab1.，…")
+    rng = random.Random(0)
+    for _ in range(20000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        for rep_map, table, pattern, multi_keys in rep_sets:
+            expected = reference_replace_chars(text, rep_map)
+            assert TextNormalizer.replace_chars(text, rep_map, table, pattern, multi_keys) == expected, text
+
+
+def test_replace_chars_fast_path_skips_multi_char_regex():
+    normalizer = TextNormalizer()
+    rep_map = normalizer.char_rep_map
+    table = normalizer.char_rep_table
+    multi_keys = normalizer.char_rep_multi_keys
+    # 不含多字符序列时只做 translate，传入 None 作为 pattern 也应得到相同结果
+    text = "你好：世界！“引号”（括号）—— 结束。"
+    assert not any(k in text for k in multi_keys)
+    assert TextNormalizer.replace_chars(text, rep_map, table, None, multi_keys) == reference_replace_chars(text, rep_map)
+    # 含多字符序列时仍走正则
+    text = "等一下...好的。。。"
+    expected = reference_replace_chars(text, rep_map)
+    assert TextNormalizer.replace_chars(text, rep_map, table, normalizer.char_rep_pattern, multi_keys) == expected